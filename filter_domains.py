@@ -1,4 +1,95 @@
-import tldextract
+import pkgutil
+
+# Marks a trie node where a PSL rule ends. Not a string, so it never collides
+# with a label from the input.
+_END = object()
+
+
+def load_public_suffixes():
+    """
+    Returns the ICANN rules of the Public Suffix List snapshot bundled with tldextract.
+    Private-domain rules (e.g. 'github.io') are skipped, so 'user.github.io' -> 'github.io'.
+    """
+    text = pkgutil.get_data("tldextract", ".tld_set_snapshot").decode("utf-8")
+    icann, _, _ = text.partition("// ===BEGIN PRIVATE DOMAINS===")
+
+    rules = []
+    for line in icann.splitlines():
+        line = line.strip()
+        if line and not line.startswith("//"):
+            rules.append(line.split()[0])
+    return rules
+
+
+def build_suffix_trie(rules):
+    """
+    Builds a dict-of-dicts trie keyed by reversed labels ('co.uk' -> {'uk': {'co': {...}}}).
+    Wildcard ('*') and exception ('!label') rules are stored as plain keys.
+    IDN rules are added in both Unicode and punycode form, so lookups only need lower().
+    """
+    root = {}
+    for rule in rules:
+        variants = [rule]
+        if not rule.isascii():
+            try:
+                variants.append(rule.encode("idna").decode("ascii"))
+            except UnicodeError:
+                pass
+
+        for variant in variants:
+            node = root
+            for label in reversed(variant.split(".")):
+                node = node.setdefault(label, {})
+            node[_END] = True
+    return root
+
+
+SUFFIX_TRIE = build_suffix_trie(load_public_suffixes())
+
+# Files are streamed: read/write buffers of 1 MiB, output is accumulated
+# in memory and handed to write() in ~64 KiB chunks.
+IO_BUFFER_SIZE = 1 << 20
+WRITE_CHUNK_SIZE = 1 << 16
+
+# First bytes of lines that are always written through untouched (comments, blank lines)
+COPY_THROUGH_PREFIXES = (b'#', b'\n', b'\r')
+
+
+def registered_domain(name, trie=SUFFIX_TRIE):
+    """
+    Finds the registered domain of a host name: 'a.b.example.co.uk' -> 'example.co.uk'.
+    Walks the suffix trie right-to-left, tracking the deepest matching rule.
+    Returns (registered_domain, has_subdomain) or (None, False) if the name
+    has no known public suffix, is a bare suffix (IP addresses, 'co.uk', ...)
+    or has an empty label in its registered part ('example..com').
+    """
+    labels = name.rstrip(".").split(".")  # 'example.com.' is a fully qualified 'example.com'
+    node = trie
+    depth = 0
+    suffix_len = 0
+
+    for label in reversed(labels):
+        label = label.lower()
+        child = node.get(label)
+        if child is not None:
+            node = child
+            depth += 1
+            if _END in node:
+                suffix_len = depth
+            continue
+
+        # '*.ck' covers any label under 'ck', except those listed as '!www.ck'
+        if "*" in node:
+            suffix_len = depth if "!" + label in node else depth + 1
+        break
+
+    if not suffix_len or suffix_len >= len(labels):
+        return None, False
+    registered = labels[-suffix_len - 1:]
+    if "" in registered:  # 'example..com' has no registered domain, not '.com'
+        return None, False
+    return ".".join(registered), len(labels) > suffix_len + 1
+
 
 def filter_domains(input_file, output_file):
     """
@@ -6,12 +97,9 @@ def filter_domains(input_file, output_file):
     Transforms subdomains (e.g., 'sub.example.com') into 'example.com'.
     Preserves comments and structure, but removes duplicates per section.
     """
-    
-    extract = tldextract.TLDExtract(include_psl_private_domains=False)
 
     try:
-        with open(input_file, 'r', encoding='utf-8') as f_in:
-            lines = f_in.readlines()
+        f_in = open(input_file, 'rb', buffering=IO_BUFFER_SIZE)
     except FileNotFoundError:
         print(f"Error: File {input_file} not found.")
         return
@@ -25,50 +113,47 @@ def filter_domains(input_file, output_file):
     # But router configs often group by service. Let's assume global uniqueness is better to avoid duplicate rules.
     
     seen_domains = set()
+    lookup = registered_domain
     
-    with open(output_file, 'w', encoding='utf-8') as f_out:
+    with f_in, open(output_file, 'wb', buffering=IO_BUFFER_SIZE) as f_out:
         processed_count = 0
         written_count = 0
+        buf = bytearray()
         
-        for line in lines:
-            original_line = line
-            stripped = line.strip()
-            
-            # Preserve empty lines and comments
+        for line in f_in:
+            if len(buf) > WRITE_CHUNK_SIZE:
+                f_out.write(buf)
+                buf.clear()
+
+            # Output always uses '\n' (as text mode did), also for copied lines of CRLF input
+            if line.endswith(b'\r\n'):
+                line = line[:-2] + b'\n'
+
+            # Preserve empty lines and comments. Most of them start right at
+            # the first byte, so they are copied through without decoding.
+            if line[:1] in COPY_THROUGH_PREFIXES:
+                buf += line
+                continue
+
+            stripped = line.decode('utf-8').strip()
             if not stripped or stripped.startswith('#'):
-                f_out.write(original_line)
+                buf += line
                 continue
             
             processed_count += 1
-            try:
-                ext = extract(stripped)
-                
-                if ext.domain and ext.suffix:
-                    # It's a domain name (e.g. google.com, sub.google.co.uk)
-                    # Reconstruct only the registered domain: domain + . + suffix
-                    base_domain = f"{ext.domain}.{ext.suffix}"
-                    
-                    if base_domain not in seen_domains:
-                        f_out.write(f"{base_domain}\n")
-                        seen_domains.add(base_domain)
-                        written_count += 1
-                elif not ext.domain and not ext.suffix and stripped:
-                     # Probably an IP address or something tldextract couldn't parse as a domain
-                     # Keep it as is if unique
-                     if stripped not in seen_domains:
-                         f_out.write(f"{stripped}\n")
-                         seen_domains.add(stripped)
-                         written_count += 1
-                else:
-                    # Weird case, maybe just suffix or just domain? 
-                    # fallback to original line if unique
-                    if stripped not in seen_domains:
-                         f_out.write(f"{stripped}\n")
-                         seen_domains.add(stripped)
-                         written_count += 1
-                    
-            except Exception as e:
-                print(f"Warning: Could not parse '{stripped}': {e}")
+
+            # Reconstruct only the registered domain (sub.google.co.uk -> google.co.uk).
+            # IP addresses and names without a known suffix are kept as is.
+            base_domain, _ = lookup(stripped)
+            if base_domain is None:
+                base_domain = stripped
+
+            if base_domain not in seen_domains:
+                buf += f"{base_domain}\n".encode('utf-8')
+                seen_domains.add(base_domain)
+                written_count += 1
+
+        f_out.write(buf)
 
     print(f"Processed {processed_count} entries.")
     print(f"Extracted {written_count} unique 2nd-level domains.")
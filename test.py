@@ -2,53 +2,295 @@
 Domain availability checker with DNS and ping verification.
 Optimized for Windows/Linux cross-platform support.
 """
+import os
+import gc
+import re
+import mmap
+import argparse
 import sys
+import time
 import ssl
+import shlex
+import shutil
+import socket
+import struct
+import random
 import platform
+import ipaddress
+import tempfile
+import subprocess
 import asyncio
-import aiodns
 import aiohttp
-from typing import Callable
+import aiohttp.abc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Awaitable, Callable, Sequence, TypeVar
+
+try:
+    import aiodns
+    import pycares
+except ImportError:  # нет сборки pycares под платформу — резолвим системным резолвером
+    aiodns = None
+
+T = TypeVar('T')
+R = TypeVar('R')
 
 # Константы
 DNS_SERVERS = ('1.1.1.1', '8.8.8.8', '9.9.9.9')
 DNS_TIMEOUT = 10.0
+DNS_QUERY_TIMEOUT = 2.0  # первая попытка c-ares; дальше перезапрос с удвоением (2 → 4с)
+DNS_QUERY_TRIES = 2  # 2 + 4 = 6с < DNS_TIMEOUT: c-ares сдаётся раньше внешнего таймаута
+DNS_CHECK_TIMEOUT = 15.0  # жёсткий предел всей проверки домена: попытки, паузы и SOA
+DNS_CACHE_TTL = 300.0          # сколько помнить успешный ответ
+DNS_NEGATIVE_CACHE_TTL = 30.0  # неудачный ответ помним недолго
+DNS_CACHE_MAXSIZE = 100_000
 PING_TIMEOUT = 5.0
 HTTP_TIMEOUT = 10.0
 TCP_TIMEOUT = 5.0
-DEFAULT_CONCURRENCY = 30
+DEAD_FILE = 'dead.txt'  # куда run_checks пишет мёртвые домены
+DEAD_FILE_BUFFER_SIZE = 1 << 20
+GC_THRESHOLD = 50_000  # порог сборки нулевого поколения на время проверок (по умолчанию 700)
+PROGRESS_INTERVAL = 0.1  # не чаще 10 обновлений прогресса в секунду
+# Воркеров на HTTP/TCP/Ping: по умолчанию из лимита открытых файлов (см. default_concurrency)
+MIN_CONCURRENCY = 50
+MAX_CONCURRENCY = 500
+PING_PROCESS_CONCURRENCY = 30  # процессы ping тяжёлые — держим их меньше
+SHARD_MIN_DOMAINS = 50_000  # меньше доменов на процесс — второй процесс не окупается
+DNS_CONCURRENCY = 200  # DNS-запросы дешёвые (UDP через общие c-ares каналы)
+SYSTEM_DNS_WORKERS = 64  # потоков для getaddrinfo, если c-ares недоступен
+# Если скользящая доля запросов, на которые ВСЕ серверы ответили SERVFAIL, выше порога —
+# новые DNS-запросы ждут паузу. SERVFAIL одного домена (lame delegation) — признак
+# мёртвого домена, а не перегрузки, поэтому порог высокий и нужен разгон
+DNS_SERVFAIL_ALPHA = 0.05  # вес нового запроса в скользящем среднем
+DNS_SERVFAIL_THRESHOLD = 0.5
+DNS_SERVFAIL_MIN_SAMPLES = 50  # до стольких запросов пауза не включается
+DNS_BACKOFF_DELAY = 0.5
+
+# На Windows aiodns требует SelectorEventLoop вместо стандартного Proactor,
+# поэтому там (и без aiodns) DNS идёт через socket.getaddrinfo в пуле потоков
+USE_SYSTEM_RESOLVER = aiodns is None or platform.system().lower() == 'windows'
+
+# Строка list.txt (конец строки — \n, \r или \r\n), не начинающаяся с '#' после ASCII-пробелов.
+# Это грубый фильтр: окончательно строку обрезает str.strip() (он знает и Unicode-пробелы)
+DOMAIN_LINE_RE = re.compile(rb'(?m)(?:^|(?<=\r))[ \t\v\f]*([^#\r\n][^\r\n]*)')
+
+# ICMP Echo (ping)
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP_PAYLOAD = b'domains-check'
+
+
+# Ответы, после которых опрашивать остальные серверы бессмысленно
+NEGATIVE_DNS_ERRORS = (aiodns.error.ARES_ENOTFOUND, aiodns.error.ARES_ENODATA) if aiodns else ()
+SERVFAIL_DNS_ERROR = aiodns.error.ARES_ESERVFAIL if aiodns else None
+SYSTEM_NEGATIVE_DNS_ERRORS = (socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME))
+
+_resolvers: tuple['aiodns.DNSResolver', ...] | None = None
+_dns_pool: ThreadPoolExecutor | None = None
+_servfail_rate = 0.0  # скользящее среднее (EWMA) доли запросов с SERVFAIL от всех серверов
+_dns_samples = 0  # сколько запросов учтено в _servfail_rate
+_dns_gate: asyncio.Event | None = None  # сброшено — DNS-запросы ждут конца паузы
+# domain -> [задача резолва, момент устаревания по loop.time()]
+_dns_cache: dict[str, list] = {}
+
+
+def get_resolvers() -> tuple['aiodns.DNSResolver', ...]:
+    """
+    Возвращает общие DNS-резолверы: по одному c-ares каналу на сервер из DNS_SERVERS.
+    Создаются лениво, чтобы привязаться к уже запущенному event loop.
+    Потерянный UDP-пакет c-ares перезапрашивает через DNS_QUERY_TIMEOUT, а не ждёт
+    весь DNS_TIMEOUT; общий предел запроса по-прежнему DNS_TIMEOUT (with_timeout).
+    ARES_FLAG_NOSEARCH: getaddrinfo не дописывает домены поиска из resolv.conf/LOCALDOMAIN,
+    иначе несуществующий домен «оживает» через wildcard-запись в зоне поиска.
+    """
+    global _resolvers
+    if _resolvers is None:
+        _resolvers = tuple(
+            aiodns.DNSResolver(
+                nameservers=[server], timeout=DNS_QUERY_TIMEOUT, tries=DNS_QUERY_TRIES,
+                flags=pycares.ARES_FLAG_NOSEARCH
+            )
+            for server in DNS_SERVERS
+        )
+    return _resolvers
+
+
+def get_dns_pool() -> ThreadPoolExecutor:
+    """Возвращает общий пул потоков для системного резолвера (создаётся лениво)."""
+    global _dns_pool
+    if _dns_pool is None:
+        _dns_pool = ThreadPoolExecutor(max_workers=SYSTEM_DNS_WORKERS, thread_name_prefix='dns')
+    return _dns_pool
+
+
+def get_dns_gate() -> asyncio.Event:
+    """Возвращает общий «шлюз» DNS-запросов (создаётся открытым, лениво — под текущий loop)."""
+    global _dns_gate
+    if _dns_gate is None:
+        _dns_gate = asyncio.Event()
+        _dns_gate.set()
+    return _dns_gate
+
+
+def is_servfail(exc: BaseException) -> bool:
+    """Проверяет, что исключение aiodns — ответ SERVFAIL."""
+    return isinstance(exc, aiodns.error.DNSError) and exc.args[0] == SERVFAIL_DNS_ERROR
+
+
+def record_dns_reply(servfail: bool) -> None:
+    """
+    Учитывает итог одного запроса (query_all_servers) в скользящей доле SERVFAIL;
+    servfail — SERVFAIL ответили все серверы.
+    Массовый SERVFAIL означает, что публичные резолверы перегружены (или режут нас по частоте):
+    шлюз закрывается на DNS_BACKOFF_DELAY, чтобы не тратить запросы впустую.
+    """
+    global _servfail_rate, _dns_samples
+    _dns_samples += 1
+    _servfail_rate += DNS_SERVFAIL_ALPHA * (servfail - _servfail_rate)
+    gate = get_dns_gate()
+    if (
+        _dns_samples >= DNS_SERVFAIL_MIN_SAMPLES
+        and _servfail_rate > DNS_SERVFAIL_THRESHOLD
+        and gate.is_set()
+    ):
+        gate.clear()
+        asyncio.get_running_loop().call_later(DNS_BACKOFF_DELAY, gate.set)
+        log_stderr(f"DNS: SERVFAIL от всех серверов в {_servfail_rate:.0%} запросов, пауза {DNS_BACKOFF_DELAY}с")
+
+
+async def close_resolvers() -> None:
+    """Закрывает общие DNS-резолверы и сбрасывает DNS-кэш (вызывается по завершении проверок)."""
+    global _resolvers, _dns_pool, _dns_gate, _servfail_rate, _dns_samples
+    _dns_cache.clear()
+    _dns_gate = None
+    _servfail_rate = 0.0
+    _dns_samples = 0
+    if _dns_pool is not None:
+        # Зависшие getaddrinfo не ждём: потоки завершатся сами
+        _dns_pool.shutdown(wait=False, cancel_futures=True)
+        _dns_pool = None
+    if _resolvers is not None:
+        for resolver in _resolvers:
+            await resolver.close()
+        _resolvers = None
+
+
+async def query_all_servers(make_query: Callable[['aiodns.DNSResolver'], asyncio.Future]):
+    """
+    Отправляет один и тот же запрос сразу на все DNS-серверы и возвращает первый ответ.
+    NXDOMAIN/NODATA тоже считаются ответом; сбой одного сервера (SERVFAIL, REFUSED)
+    ждёт остальные. Оставшиеся запросы отменяются.
+    Если не ответил ни один, SERVFAIL бросается, только когда его вернули все серверы;
+    иначе — другая ошибка (таймаут и т.п.), которую имеет смысл повторить.
+    Во время паузы после серии SERVFAIL (см. record_dns_reply) новый запрос ждёт.
+    """
+    await get_dns_gate().wait()
+    pending = {make_query(resolver) for resolver in get_resolvers()}
+    errors = []
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # exception() забираем у всех завершённых, иначе asyncio ругается в лог
+            for fut, exc in [(fut, fut.exception()) for fut in done]:
+                if exc is None:
+                    record_dns_reply(False)
+                    return fut.result()
+                if isinstance(exc, aiodns.error.DNSError) and exc.args[0] in NEGATIVE_DNS_ERRORS:
+                    record_dns_reply(False)
+                    raise exc
+                errors.append(exc)
+        record_dns_reply(all(is_servfail(exc) for exc in errors))
+        raise next((exc for exc in errors if not is_servfail(exc)), errors[0])
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+async def check_soa(domain: str, timeout: float = DNS_TIMEOUT) -> bool:
+    """
+    Проверяет, существует ли зона домена (есть ли SOA-запись).
+    Нужно для корневых доменов без A-записи (CDN/Service roots).
+    """
+    try:
+        await with_timeout(
+            query_all_servers(lambda r: r.query(domain, 'SOA')),
+            timeout=timeout
+        )
+        return True
+    except (aiodns.error.DNSError, asyncio.TimeoutError):
+        return False
+
+
+def get_cached_dns(domain: str) -> asyncio.Future[tuple[bool, str | None]] | None:
+    """Возвращает задачу резолва домена из кэша, если она ещё не устарела."""
+    entry = _dns_cache.get(domain)
+    if entry is None:
+        return None
+    task, expires_at = entry
+    if asyncio.get_running_loop().time() < expires_at:
+        return task
+    del _dns_cache[domain]
+    return None
 
 
 async def check_dns(domain: str, timeout: float = DNS_TIMEOUT, retries: int = 2) -> tuple[bool, str | None]:
     """
-    Проверяет DNS-резолв домена через несколько серверов.
+    Проверяет DNS-резолв домена (см. resolve_domain) с кэшем:
+    успешный ответ живёт DNS_CACHE_TTL, неудачный — DNS_NEGATIVE_CACHE_TTL.
+    Одновременные проверки одного домена ждут один и тот же запрос.
+    Вся проверка ограничена DNS_CHECK_TIMEOUT, так что воркер не зависает на одном домене.
     Возвращает (success, ip_address).
-    Если A-запись не найдена, проверяет SOA (чтобы не удалять корневые домены типа oaiusercontent.com).
+    """
+    task = get_cached_dns(domain)
+    if task is None:
+        loop = asyncio.get_running_loop()
+        resolve = resolve_domain_system if USE_SYSTEM_RESOLVER else resolve_domain
+        task = asyncio.ensure_future(with_timeout(resolve(domain, timeout, retries), DNS_CHECK_TIMEOUT))
+        # Пока запрос идёт, запись не устаревает; срок ставится по результату
+        entry = [task, float('inf')]
+        
+        def set_expiry(task: asyncio.Future) -> None:
+            ok = not task.cancelled() and task.exception() is None and task.result()[0]
+            entry[1] = loop.time() + (DNS_CACHE_TTL if ok else DNS_NEGATIVE_CACHE_TTL)
+        
+        task.add_done_callback(set_expiry)
+        if len(_dns_cache) >= DNS_CACHE_MAXSIZE:
+            # Вытесняем самую старую запись (dict хранит порядок вставки)
+            del _dns_cache[next(iter(_dns_cache))]
+        _dns_cache[domain] = entry
+    try:
+        # shield: отмена одного ожидающего не должна отменять общий запрос
+        return await asyncio.shield(task)
+    except asyncio.TimeoutError:
+        return False, None
+
+
+async def resolve_domain(domain: str, timeout: float = DNS_TIMEOUT, retries: int = 2) -> tuple[bool, str | None]:
+    """
+    Проверяет DNS-резолв домена через getaddrinfo (учитывает /etc/hosts).
+    Запрос уходит на все DNS_SERVERS параллельно, побеждает первый ответ.
+    Возвращает (success, ip_address).
+    Если адресов нет, один раз проверяет SOA (чтобы не удалять корневые домены типа oaiusercontent.com).
     """
     for attempt in range(retries):
-        resolver = aiodns.DNSResolver()
-        for server in DNS_SERVERS:
-            resolver.nameservers = [server]
-            try:
-                # Попытка 1: Ищем A-запись (IPv4)
-                result = await asyncio.wait_for(
-                    resolver.query(domain, 'A'),
-                    timeout=timeout
-                )
-                if result:
-                    return True, result[0].host
-            except (aiodns.error.DNSError, asyncio.TimeoutError):
-                # Если A-записи нет, проверяем SOA (существует ли зона вообще)
-                # Делаем это только на последней попытке или если ошибка явная (NODATA)
-                try:
-                    await asyncio.wait_for(
-                        resolver.query(domain, 'SOA'),
-                        timeout=timeout
-                    )
-                    # Зона существует, но нет A-записи (нормально для CDN/Service roots)
-                    return True, None
-                except (aiodns.error.DNSError, asyncio.TimeoutError):
-                    continue
+        try:
+            result = await with_timeout(
+                query_all_servers(
+                    lambda r: r.getaddrinfo(domain, family=socket.AF_INET, type=socket.SOCK_STREAM)
+                ),
+                timeout=timeout
+            )
+            if result.nodes:
+                return True, result.nodes[0].addr[0].decode()
+        except aiodns.error.DNSError as e:
+            # Сервер ответил, но адресов нет: повторять бессмысленно,
+            # остаётся проверить, существует ли зона вообще
+            if e.args[0] in NEGATIVE_DNS_ERRORS:
+                return await check_soa(domain, timeout), None
+            # SERVFAIL от всех серверов (обычно lame delegation) — окончательный ответ
+            if is_servfail(e):
+                return False, None
+        except asyncio.TimeoutError:
+            pass
                     
         # Небольшая пауза перед retry (если сервер вообще не ответил)
         if attempt < retries - 1:
@@ -57,17 +299,219 @@ async def check_dns(domain: str, timeout: float = DNS_TIMEOUT, retries: int = 2)
     return False, None
 
 
-async def check_ping(domain: str, timeout: float = PING_TIMEOUT) -> bool:
+async def resolve_domain_system(domain: str, timeout: float = DNS_TIMEOUT, retries: int = 2) -> tuple[bool, str | None]:
     """
-    Асинхронный ping с кроссплатформенной поддержкой.
-    Примечание: многие живые серверы блокируют ICMP (ping).
+    Запасной вариант resolve_domain: socket.getaddrinfo в пуле из SYSTEM_DNS_WORKERS потоков.
+    Работает через системный резолвер (а не DNS_SERVERS) и не умеет SOA,
+    поэтому домен без A-записи считается нерезолвящимся.
+    Возвращает (success, ip_address).
+    """
+    loop = asyncio.get_running_loop()
+    # Точка в конце — полное имя: системный резолвер не дописывает домены поиска
+    # (resolv.conf/LOCALDOMAIN), иначе домен «оживает» через wildcard в зоне поиска
+    fqdn = domain.rstrip('.') + '.'
+    for attempt in range(retries):
+        try:
+            infos = await with_timeout(
+                loop.run_in_executor(
+                    get_dns_pool(), socket.getaddrinfo, fqdn, None, socket.AF_INET, socket.SOCK_STREAM
+                ),
+                timeout=timeout
+            )
+            if infos:
+                return True, infos[0][4][0]
+        except socket.gaierror as e:
+            # Имя точно не существует — повторять бессмысленно
+            if e.errno in SYSTEM_NEGATIVE_DNS_ERRORS:
+                return False, None
+        except asyncio.TimeoutError:
+            pass
+        
+        if attempt < retries - 1:
+            await asyncio.sleep(0.5)
+    
+    return False, None
+
+
+def ones_complement_sum(data: bytes) -> int:
+    """Сумма 16-битных слов (big-endian) без свёртки переносов; нечётный хвост дополняется нулём."""
+    if len(data) % 2:
+        data += b'\x00'
+    return sum(struct.unpack(f'!{len(data) // 2}H', data))
+
+
+def fold_checksum(total: int) -> int:
+    """Сворачивает переносы суммы слов в 16 бит и возвращает дополнение до единицы."""
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+# Нагрузка Echo Request постоянна — её слова суммируются один раз
+ICMP_PAYLOAD_SUM = ones_complement_sum(ICMP_PAYLOAD)
+
+
+def build_echo_request(ident: int, seq: int) -> bytes:
+    """
+    Собирает ICMP Echo Request: 8-байтовый заголовок + полезная нагрузка.
+    Контрольная сумма считается из слов заголовка (тип/код, ident, seq)
+    и заранее посчитанной суммы нагрузки, без сборки пакета дважды.
+    """
+    checksum = fold_checksum((ICMP_ECHO_REQUEST << 8) + ident + seq + ICMP_PAYLOAD_SUM)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + ICMP_PAYLOAD
+
+
+def parse_echo_reply(data: bytes) -> tuple[int, int] | None:
+    """Возвращает (идентификатор, номер) ICMP Echo Reply или None, если это другой пакет."""
+    # SOCK_RAW (и SOCK_DGRAM на macOS) отдаёт ответ вместе с IP-заголовком
+    if data and data[0] >> 4 == 4:
+        data = data[(data[0] & 0x0F) * 4:]
+    if len(data) >= 8 and data[0] == ICMP_ECHO_REPLY:
+        return struct.unpack_from('!HH', data, 4)
+    return None
+
+
+def open_icmp_socket() -> tuple[socket.socket, bool]:
+    """
+    Открывает неблокирующий ICMP-сокет: непривилегированный SOCK_DGRAM
+    (Linux с net.ipv4.ping_group_range, macOS), иначе SOCK_RAW (root / CAP_NET_RAW).
+    Возвращает (sock, is_raw). Бросает OSError, если недоступны оба.
+    """
+    try:
+        sock, is_raw = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP), False
+    except OSError:
+        sock, is_raw = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+    sock.setblocking(False)
+    return sock, is_raw
+
+
+async def sock_sendto(sock: socket.socket, data: bytes, address: tuple) -> None:
+    """sendto() для неблокирующего сокета: при полном буфере ждёт готовности на запись."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            sock.sendto(data, address)
+            return
+        except (BlockingIOError, InterruptedError):
+            writable = loop.create_future()
+            loop.add_writer(sock.fileno(), writable.set_result, None)
+            try:
+                await writable
+            finally:
+                loop.remove_writer(sock.fileno())
+
+
+# Общий ICMP-сокет: открывается один раз, ответы разбирает один обработчик чтения
+_icmp_socket: tuple[socket.socket, bool, asyncio.AbstractEventLoop] | None = None
+_icmp_ident = random.getrandbits(16)
+_icmp_seq = 0
+# (IP, номер запроса) -> future, которая завершится при получении ответа
+_icmp_waiters: dict[tuple[str, int], asyncio.Future] = {}
+
+
+def on_icmp_readable() -> None:
+    """Обработчик чтения общего ICMP-сокета: завершает futures ответивших адресов."""
+    sock, is_raw, _ = _icmp_socket
+    while True:
+        try:
+            data, addr = sock.recvfrom(1024)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            # Ошибки доставки (недоступный адрес) — ответа просто не будет
+            continue
+        reply = parse_echo_reply(data)
+        # В SOCK_DGRAM идентификатор подставляет ядро, оно же фильтрует чужие ответы;
+        # SOCK_RAW получает все ICMP-пакеты хоста
+        if reply is None or (is_raw and reply[0] != _icmp_ident):
+            continue
+        waiter = _icmp_waiters.get((addr[0], reply[1]))
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+
+def get_icmp_socket() -> tuple[socket.socket, bool]:
+    """
+    Возвращает общий ICMP-сокет (см. open_icmp_socket), открывая его при первом вызове
+    и подключая on_icmp_readable к текущему event loop.
+    Бросает OSError, если ICMP-сокеты недоступны, и NotImplementedError
+    на event loop без add_reader (ProactorEventLoop в Windows).
+    """
+    global _icmp_socket
+    loop = asyncio.get_running_loop()
+    if _icmp_socket is not None and _icmp_socket[2] is not loop:
+        close_icmp_socket()
+    if _icmp_socket is None:
+        sock, is_raw = open_icmp_socket()
+        try:
+            loop.add_reader(sock.fileno(), on_icmp_readable)
+        except BaseException:
+            sock.close()
+            raise
+        _icmp_socket = (sock, is_raw, loop)
+    return _icmp_socket[0], _icmp_socket[1]
+
+
+def close_icmp_socket() -> None:
+    """Закрывает общий ICMP-сокет (вызывается по завершении проверок)."""
+    global _icmp_socket
+    if _icmp_socket is not None:
+        sock, _, loop = _icmp_socket
+        if not loop.is_closed():
+            loop.remove_reader(sock.fileno())
+        sock.close()
+        _icmp_socket = None
+
+
+async def ping_many(ips: list[str], timeout: float = PING_TIMEOUT) -> set[str]:
+    """
+    Пингует все IPv4-адреса через общий ICMP-сокет (см. get_icmp_socket):
+    один пакет Echo Request на весь вызов, N вызовов sendto.
+    Ответы сопоставляются по адресу отправителя и номеру запроса
+    (и идентификатору для SOCK_RAW). Возвращает ответившие адреса.
+    Бросает OSError, если ICMP-сокеты недоступны, и NotImplementedError
+    на event loop без add_reader (ProactorEventLoop в Windows).
+    """
+    global _icmp_seq
+    ips = list(dict.fromkeys(ips))
+    if not ips:
+        return set()
+    
+    loop = asyncio.get_running_loop()
+    sock, _ = get_icmp_socket()
+    # Свой номер на каждый вызов: одновременные вызовы не перехватывают чужие ответы
+    _icmp_seq = seq = (_icmp_seq + 1) & 0xFFFF
+    waiters = {ip: loop.create_future() for ip in ips}
+    for ip, waiter in waiters.items():
+        _icmp_waiters[ip, seq] = waiter
+    
+    try:
+        packet = build_echo_request(_icmp_ident, seq)
+        for ip in ips:
+            try:
+                await sock_sendto(sock, packet, (ip, 0))
+            except OSError:
+                pass
+        await asyncio.wait(waiters.values(), timeout=timeout)
+        return {ip for ip, waiter in waiters.items() if waiter.done()}
+    finally:
+        for ip, waiter in waiters.items():
+            del _icmp_waiters[ip, seq]
+            waiter.cancel()
+
+
+async def subprocess_ping(target: str, timeout: float = PING_TIMEOUT) -> bool:
+    """
+    Ping через системную утилиту ping (запасной вариант).
+    Работает и с доменом: резолвит его сама система.
     """
     is_windows = platform.system().lower() == 'windows'
     
     if is_windows:
-        cmd = ['ping', '-n', '1', '-w', str(int(timeout * 1000)), domain]
+        cmd = ['ping', '-n', '1', '-w', str(int(timeout * 1000)), target]
     else:
-        cmd = ['ping', '-c', '1', '-W', str(int(timeout)), domain]
+        # -n: без обратного DNS-запроса (PTR) для адреса ответившего хоста
+        cmd = ['ping', '-n', '-c', '1', '-W', str(int(timeout)), target]
     
     proc = None
     try:
@@ -76,7 +520,7 @@ async def check_ping(domain: str, timeout: float = PING_TIMEOUT) -> bool:
             stdout=asyncio.subprocess.DEVNULL,
             stderr=asyncio.subprocess.DEVNULL
         )
-        await asyncio.wait_for(proc.wait(), timeout=timeout + 2)
+        await with_timeout(proc.wait(), timeout=timeout + 2)
         return proc.returncode == 0
     except asyncio.TimeoutError:
         if proc:
@@ -86,182 +530,636 @@ async def check_ping(domain: str, timeout: float = PING_TIMEOUT) -> bool:
         return False
 
 
-async def check_tcp_port(host: str, port: int, timeout: float = TCP_TIMEOUT) -> bool:
+def is_ipv4(value: str) -> bool:
+    """Проверяет, является ли строка IPv4-адресом."""
+    try:
+        return isinstance(ipaddress.ip_address(value), ipaddress.IPv4Address)
+    except ValueError:
+        return False
+
+
+_icmp_supported = True
+
+
+async def ping_all(
+    targets: list[str],
+    timeout: float = PING_TIMEOUT,
+    concurrency: int = PING_PROCESS_CONCURRENCY
+) -> set[str]:
     """
-    Проверяет открыт ли TCP-порт.
-    host может быть доменом или IP-адресом.
+    Асинхронный ping с кроссплатформенной поддержкой, сразу для всех целей.
+    IPv4-адреса пингуются одним пакетом через общий ICMP-сокет — без запуска процесса на каждый домен
+    (адреса уже получены на шаге DNS, повторного резолва нет).
+    Домены без IP или система без ICMP-сокетов — через утилиту ping (не более concurrency процессов).
+    Возвращает множество ответивших целей.
+    Примечание: многие живые серверы блокируют ICMP (ping).
     """
+    global _icmp_supported
+    targets = set(targets)
+    ips = {target for target in targets if is_ipv4(target)}
+    others = targets - ips
+    replied: set[str] = set()
+    
+    if _icmp_supported:
+        try:
+            replied = await ping_many(list(ips), timeout)
+        except (OSError, NotImplementedError):
+            # Нет прав на ICMP-сокеты или loop без add_reader (Windows)
+            _icmp_supported = False
+            others |= ips
+    else:
+        others |= ips
+    
+    # Пул воркеров, а не задача на каждую цель (как и в шагах run_checks)
+    others = list(others)
+    results = await bounded_map(lambda t: subprocess_ping(t, timeout), others, concurrency, False)
+    replied.update(target for target, ok in zip(others, results) if ok)
+    return replied
+
+
+async def check_tcp_port(ip: str, port: int, timeout: float = TCP_TIMEOUT) -> bool:
+    """
+    Проверяет открыт ли TCP-порт на IP-адресе.
+    Только connect() на голом неблокирующем сокете: без транспорта, StreamReader
+    и служебных вызовов (getsockname, getpeername, TCP_NODELAY), которые делает
+    open_connection. Соединение сбрасывается RST (SO_LINGER с нулевым таймаутом),
+    без обмена FIN и TIME_WAIT на нашей стороне.
+    """
+    loop = asyncio.get_running_loop()
+    family = socket.AF_INET6 if ':' in ip else socket.AF_INET
     try:
-        _, writer = await asyncio.wait_for(
-            asyncio.open_connection(host, port),
-            timeout=timeout
-        )
-        writer.close()
-        await writer.wait_closed()
-        return True
-    except Exception:
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.setblocking(False)
+            await with_timeout(loop.sock_connect(sock, (ip, port)), timeout=timeout)
+            # Порт открыт — этого достаточно; close() при выходе из with пошлёт RST
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            return True
+    except (OSError, asyncio.TimeoutError):
         return False
 
 
-async def check_http(domain: str, timeout: float = HTTP_TIMEOUT) -> bool:
+async def check_tcp(host: str, ports: tuple[int, ...] = (443, 80), timeout: float = TCP_TIMEOUT) -> bool:
     """
-    Проверяет HTTP/HTTPS доступность домена.
+    Проверяет, открыт ли хотя бы один из TCP-портов.
+    Порты проверяются параллельно: закрытый 443 не задерживает проверку 80.
     """
-    timeout_obj = aiohttp.ClientTimeout(total=timeout)
+    return await any_true(*(check_tcp_port(host, port, timeout) for port in ports))
+
+
+async def any_true(*coros) -> bool:
+    """
+    Запускает проверки параллельно и возвращает True, как только любая из них вернула True.
+    Оставшиеся проверки отменяются.
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            if await next_done:
+                return True
+        return False
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class CachedDNSResolver(aiohttp.abc.AbstractResolver):
+    """
+    Резолвер для aiohttp: адрес домена берётся из результатов шага DNS (hosts: домен → IP,
+    заполняет run_checks), поэтому HTTP не делает повторный DNS-запрос. В отличие от
+    кэша check_dns, эти адреса не устаревают и не вытесняются до конца прогона.
+    Хосты, которых нет в hosts (например, после редиректа), резолвит fallback.
+    """
+    
+    def __init__(self, fallback: aiohttp.abc.AbstractResolver):
+        self.fallback = fallback
+        self.hosts: dict[str, str] = {}
     
-    # Создаём SSL-контекст который не проверяет сертификаты, но поддерживает SNI
+    async def resolve(
+        self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET
+    ) -> list[aiohttp.abc.ResolveResult]:
+        if family in (socket.AF_UNSPEC, socket.AF_INET):
+            ip_address = self.hosts.get(host)
+            if ip_address:
+                return [{
+                    'hostname': host,
+                    'host': ip_address,
+                    'port': port,
+                    'family': socket.AF_INET,
+                    'proto': 0,
+                    'flags': socket.AI_NUMERICHOST,
+                }]
+        return await self.fallback.resolve(host, port, family)
+    
+    async def close(self) -> None:
+        await self.fallback.close()
+
+
+def create_http_session(resolver: aiohttp.abc.AbstractResolver) -> aiohttp.ClientSession:
+    """
+    Создаёт общую HTTP-сессию на весь прогон проверок.
+    Пул соединений, кэш TLS-сессий и DNS-кэш переиспользуются между доменами
+    (много доменов живёт на одних и тех же CDN).
+    Резолвер передаётся снаружи: сессия его не закрывает.
+    """
+    # SSL-контекст который не проверяет сертификаты, но поддерживает SNI
     ssl_context = ssl.create_default_context()
     ssl_context.check_hostname = False
     ssl_context.verify_mode = ssl.CERT_NONE
     
-    connector = aiohttp.TCPConnector(ssl=ssl_context, limit=1)
+    # limit=0: параллельность уже ограничена пулом воркеров в run_checks
+    connector = aiohttp.TCPConnector(
+        ssl=ssl_context,
+        limit=0,
+        use_dns_cache=True,
+        ttl_dns_cache=300,
+        resolver=resolver
+    )
     
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     }
     
-    try:
-        async with aiohttp.ClientSession(
-            connector=connector,
-            timeout=timeout_obj,
-            headers=headers
-        ) as session:
-            for scheme in ('https', 'http'):
-                url = f"{scheme}://{domain}"
-                try:
-                    async with session.head(url, allow_redirects=True) as resp:
-                        return True
-                except Exception:
-                    # Некоторые серверы не поддерживают HEAD, пробуем GET
-                    try:
-                        async with session.get(url, allow_redirects=True) as resp:
-                            return True
-                    except Exception:
-                        continue
-    except Exception:
-        pass
-    return False
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        headers=headers
+    )
 
 
-async def check_domain(
-    domain: str, 
-    semaphore: asyncio.Semaphore,
-    use_http: bool = True
-) -> tuple[str, bool, dict]:
+async def check_http(domain: str, session: aiohttp.ClientSession, timeout: float = HTTP_TIMEOUT) -> bool:
     """
-    Проверяет домен по четырём критериям: DNS → HTTP → TCP → Ping.
-    
-    Логика:
-    - Живой, если работает ХОТЯ БЫ ОДИН метод (DNS или HTTP или TCP или Ping).
-    - Мёртвый, если не работает НИЧЕГО.
-    
-    Возвращает (domain, is_alive, details).
+    Проверяет HTTP/HTTPS доступность домена через общую сессию.
     """
-    async with semaphore:
-        details = {'dns': False, 'http': False, 'tcp': False, 'ping': False}
-        
+    timeout_obj = aiohttp.ClientTimeout(total=timeout)
+    
+    for scheme in ('https', 'http'):
+        url = f"{scheme}://{domain}"
         try:
-            # Шаг 1: DNS
-            dns_ok, ip_address = await check_dns(domain)
-            details['dns'] = dns_ok
-            
-            # Шаг 2: HTTP (только если DNS ок, так эффективнее)
-            if dns_ok and use_http:
-                details['http'] = await check_http(domain)
-            
-            # Шаг 3: TCP (только если есть IP)
-            if ip_address:
-                for port in (443, 80):
-                    if await check_tcp_port(ip_address, port):
-                        details['tcp'] = True
-                        break
-            
-            # Шаг 4: Ping (как последний шанс, даже если DNS провалился)
-            target = ip_address if ip_address else domain
-            details['ping'] = await check_ping(target)
-            
-            # Итоговое решение: жив, если хоть что-то сработало
-            is_alive = details['dns'] or details['http'] or details['tcp'] or details['ping']
-            
-            return domain, is_alive, details
-            
+            async with session.head(url, allow_redirects=True, timeout=timeout_obj) as resp:
+                return True
         except Exception:
-            return domain, False, details
+            # Некоторые серверы не поддерживают HEAD, пробуем GET
+            try:
+                async with session.get(url, allow_redirects=True, timeout=timeout_obj) as resp:
+                    return True
+            except Exception:
+                continue
+    return False
+
+
+async def with_timeout(aw: Awaitable[T], timeout: float) -> T:
+    """
+    Как asyncio.wait_for, но без отдельной задачи на каждый вызов (Python 3.11+):
+    таймаут отменяет текущую задачу через asyncio.timeout. Бросает asyncio.TimeoutError.
+    На 3.10 — обычный asyncio.wait_for.
+    """
+    if not hasattr(asyncio, 'timeout'):
+        return await asyncio.wait_for(aw, timeout)
+    async with asyncio.timeout(timeout):
+        return await aw
+
+
+async def bounded_map(
+    func: Callable[[T], Awaitable[R]],
+    items: Sequence[T],
+    concurrency: int,
+    default: R,
+    on_done: Callable[[], None] | None = None
+) -> list[R]:
+    """
+    Применяет func к каждому элементу пулом из `concurrency` воркеров
+    (задачи не создаются на каждый элемент, семафор не нужен: воркеров ровно `concurrency`)
+    и возвращает результаты в исходном порядке.
+    Если func падает с исключением, для элемента записывается default.
+    """
+    results = [default] * len(items)
+    pending = iter(enumerate(items))
+    
+    async def worker() -> None:
+        # Воркеры делят один итератор: каждый берёт следующий свободный элемент
+        for i, item in pending:
+            try:
+                results[i] = await func(item)
+            except Exception:
+                pass
+            if on_done:
+                on_done()
+    
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(items)))))
+    return results
+
+
+async def stage_dns(
+    domains: list[str],
+    concurrency: int,
+    on_done: Callable[[], None] | None = None
+) -> tuple[list[bool], list[str | None]]:
+    """Шаг 1: DNS для всех доменов. Возвращает (dns_ok[], ips[])."""
+    results = await bounded_map(check_dns, domains, concurrency, (False, None), on_done)
+    return [ok for ok, _ in results], [ip for _, ip in results]
+
+
+async def stage_http(
+    domains: list[str],
+    enabled: list[bool],
+    session: aiohttp.ClientSession,
+    concurrency: int,
+    on_done: Callable[[], None] | None = None
+) -> list[bool]:
+    """Шаг 2: HTTP для доменов, у которых enabled[i] (DNS ок и HTTP включён)."""
+    async def check(i: int) -> bool:
+        return enabled[i] and await check_http(domains[i], session)
+    
+    return await bounded_map(check, range(len(domains)), concurrency, False, on_done)
+
+
+async def stage_tcp(
+    ips: list[str | None],
+    concurrency: int,
+    on_done: Callable[[], None] | None = None
+) -> list[bool]:
+    """Шаг 3: TCP :443/:80 для доменов с IP."""
+    async def check(ip: str | None) -> bool:
+        return ip is not None and await check_tcp(ip)
+    
+    return await bounded_map(check, ips, concurrency, False, on_done)
+
+
+async def stage_ping(targets: list[str], concurrency: int) -> list[bool]:
+    """Шаг 4: Ping всех целей одним пакетом (ping_all)."""
+    replied = await ping_all(targets, concurrency=min(concurrency, PING_PROCESS_CONCURRENCY))
+    return [target in replied for target in targets]
 
 
 async def run_checks(
     domains: list[str],
-    concurrency: int = DEFAULT_CONCURRENCY,
+    concurrency: int | None = None,
     use_http: bool = True,
-    progress_callback: Callable[[int, int], None] | None = None
-) -> tuple[list[tuple[str, dict]], list[tuple[str, dict]]]:
+    progress_callback: Callable[[int, int], None] | None = None,
+    dns_concurrency: int = DNS_CONCURRENCY,
+    use_ping: bool = False,
+    dead_path: str = DEAD_FILE
+) -> tuple[int, int]:
     """
-    Запускает проверку всех доменов с ограничением параллельности.
+    Проверяет домены по критериям: DNS → HTTP → TCP (→ Ping, если use_ping).
+    Сначала все домены проходят DNS, затем HTTP, TCP и Ping идут одновременно
+    (им нужен только результат DNS): время ≈ DNS + max(HTTP, TCP, Ping).
+    Ping по умолчанию выключен: многие хосты режут ICMP, а TCP-соединение
+    с :443/:80 после успешного DNS и так показывает, что хост отвечает.
+    Результаты шагов хранятся столбцами (списками по домену), что позволяет
+    пинговать одним пакетом и прогревать общую HTTP-сессию.
     
-    Возвращает (alive_domains, dead_domains) с деталями проверки.
+    Логика:
+    - Живой, если работает ХОТЯ БЫ ОДИН метод (DNS или HTTP или TCP или Ping).
+    - Без use_ping столбца 'ping' в деталях нет.
+    - Мёртвый, если не работает НИЧЕГО.
+    
+    Мёртвые домены записываются в dead_path строками 'домен  # статус' (см. format_status).
+    Возвращает (число живых, число мёртвых).
     
     Гарантии:
     - Каждый домен будет проверен (нет пропусков)
-    - Результаты возвращаются по мере готовности
-    - Semaphore предотвращает перегрузку
+    - В шаге DNS работает не больше `dns_concurrency` запросов,
+      в остальных шагах — не больше `concurrency` проверок
+      (по умолчанию default_concurrency(), процессов ping — не больше PING_PROCESS_CONCURRENCY)
+    - Внутри шага нет барьеров: воркер берёт следующий домен, как только освободится
     """
-    semaphore = asyncio.Semaphore(concurrency)
+    concurrency = concurrency or default_concurrency()
     total = len(domains)
+    steps_total = total * 3  # DNS, HTTP, TCP; ping идёт одним пакетом
+    steps_done = 0
     
-    # Создаём все задачи сразу
-    tasks = [
-        asyncio.create_task(check_domain(d, semaphore, use_http))
-        for d in domains
-    ]
+    def step_done() -> None:
+        nonlocal steps_done
+        steps_done += 1
+        if progress_callback:
+            progress_callback(steps_done, steps_total)
     
-    alive = []
-    dead = []
-    processed = 0
+    # aiohttp по умолчанию резолвит через getaddrinfo в пуле потоков.
+    # Здесь адреса берутся из результатов шага DNS, остальное — AsyncResolver
+    # через те же DNS_SERVERS (c-ares, без потоков), а без c-ares — как обычно
+    fallback_resolver = (
+        aiohttp.ThreadedResolver() if USE_SYSTEM_RESOLVER
+        else aiohttp.AsyncResolver(nameservers=list(DNS_SERVERS))
+    )
+    http_resolver = CachedDNSResolver(fallback_resolver)
+    session = create_http_session(http_resolver)
+    # Всё созданное до проверок (модули, список доменов) уходит в «вечное» поколение GC,
+    # а сборки запускаются реже: иначе GC снова и снова обходит тысячи живых задач
+    gc_threshold = gc.get_threshold()
+    gc.freeze()
+    gc.set_threshold(GC_THRESHOLD, *gc_threshold[1:])
+    try:
+        dns_ok, ips = await stage_dns(domains, dns_concurrency, step_done)
+        http_resolver.hosts.update((domain, ip) for domain, ip in zip(domains, ips) if ip)
+        # HTTP, TCP и Ping зависят только от результата DNS — запускаем их одновременно.
+        # Ping — последний шанс, даже если DNS провалился
+        stages = [
+            stage_http(domains, [ok and use_http for ok in dns_ok], session, concurrency, step_done),
+            stage_tcp(ips, concurrency, step_done),
+        ]
+        if use_ping:
+            stages.append(stage_ping([ip or domain for domain, ip in zip(domains, ips)], concurrency))
+        http_ok, tcp_ok, *ping_ok = await asyncio.gather(*stages)
+    finally:
+        await session.close()
+        await http_resolver.close()
+        await close_resolvers()
+        close_icmp_socket()
+        gc.set_threshold(*gc_threshold)
+        gc.unfreeze()
     
-    # Обрабатываем результаты по мере готовности
-    for coro in asyncio.as_completed(tasks):
-        try:
-            domain, is_alive, details = await coro
-        except Exception:
-            # Не должно случиться, но на всякий случай
-            continue
-        
-        if is_alive:
-            alive.append((domain, details))
-        else:
-            dead.append((domain, details))
-        
-        processed += 1
-        if progress_callback:
-            progress_callback(processed, total)
+    checks = {'dns': dns_ok, 'http': http_ok, 'tcp': tcp_ok}
+    if use_ping:
+        checks['ping'] = ping_ok[0]
+    alive_count = 0
+    dead_count = 0
     
-    return alive, dead
+    # Мёртвые домены сразу уходят в файл, а не копятся списком в памяти
+    with open(dead_path, 'w', encoding='utf-8', buffering=DEAD_FILE_BUFFER_SIZE) as dead_file:
+        for i, domain in enumerate(domains):
+            details = {name: column[i] for name, column in checks.items()}
+            # Итоговое решение: жив, если хоть что-то сработало
+            if any(details.values()):
+                alive_count += 1
+            else:
+                dead_file.write(f"{domain}  # {format_status(details)}\n")
+                dead_count += 1
+    
+    return alive_count, dead_count
+
+
+_last_progress = 0.0  # time.monotonic() последнего вывода прогресса
+
+
+def raise_nofile_limit() -> int | None:
+    """
+    Поднимает мягкий лимит открытых файлов (RLIMIT_NOFILE), чтобы хватило на MAX_CONCURRENCY
+    сокетов с запасом, но не выше жёсткого. Возвращает итоговый мягкий лимит
+    или None, если лимиты недоступны (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = MAX_CONCURRENCY * 4
+    if soft != resource.RLIM_INFINITY and soft < wanted:
+        new_soft = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (new_soft, hard))
+            soft = new_soft
+        except (ValueError, OSError):
+            pass
+    return soft
+
+
+def default_concurrency() -> int:
+    """
+    Число воркеров HTTP/TCP/Ping по лимиту открытых файлов: четверть RLIMIT_NOFILE
+    (два шага работают одновременно, плюс DNS-сокеты и запас),
+    в пределах MIN_CONCURRENCY..MAX_CONCURRENCY.
+    """
+    try:
+        import resource
+    except ImportError:
+        return MIN_CONCURRENCY
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return MAX_CONCURRENCY
+    return max(MIN_CONCURRENCY, min(MAX_CONCURRENCY, soft // 4))
 
 
 def print_progress(current: int, total: int) -> None:
-    """Выводит прогресс в одну строку."""
+    """
+    Выводит прогресс в одну строку в stderr (stdout остаётся для результатов).
+    Обновляется не чаще PROGRESS_INTERVAL; если stderr не терминал —
+    без промежуточных '\r'-обновлений, только итоговая строка.
+    """
+    global _last_progress
+    finished = current >= total
+    if not finished:
+        now = time.monotonic()
+        if now - _last_progress < PROGRESS_INTERVAL or not sys.stderr.isatty():
+            return
+        _last_progress = now
+    
     pct = (current / total * 100) if total > 0 else 0
-    print(f"\rПрогресс: {current}/{total} ({pct:.1f}%)", end='', flush=True)
+    line = f"Прогресс: {current}/{total} проверок ({pct:.1f}%)"
+    sys.stderr.write(f"\r{line}\n" if finished else f"\r{line}")
+    sys.stderr.flush()
+
+
+_progress_bar = None  # активная полоса tqdm (см. make_tqdm_progress), иначе None
+
+
+def log_stderr(message: str) -> None:
+    """Пишет сообщение в stderr, не ломая строку прогресса (через tqdm.write, если полоса активна)."""
+    if _progress_bar is not None:
+        _progress_bar.write(message, file=sys.stderr)
+    else:
+        print(f"\n{message}", file=sys.stderr)
+
+
+def make_tqdm_progress() -> Callable[[int, int], None] | None:
+    """
+    Возвращает progress_callback на tqdm, если он установлен и stderr — терминал,
+    иначе None (см. print_progress: вне терминала — только итоговая строка).
+    tqdm сам ограничивает частоту перерисовки и выводит скорость и оставшееся время.
+    """
+    if not sys.stderr.isatty():
+        return None
+    try:
+        from tqdm import tqdm
+    except ImportError:
+        return None
+    
+    def progress(current: int, total: int) -> None:
+        global _progress_bar
+        if _progress_bar is None:
+            _progress_bar = tqdm(total=total, unit=' проверок', file=sys.stderr,
+                                 mininterval=PROGRESS_INTERVAL, dynamic_ncols=True)
+        _progress_bar.update(current - _progress_bar.n)
+        if current >= total:
+            _progress_bar.close()
+            _progress_bar = None
+    
+    return progress
 
 
 def load_domains(file_path: str) -> list[str]:
-    """Загружает домены из файла, пропуская пустые строки, комментарии и дубликаты."""
+    """
+    Загружает домены из файла, пропуская пустые строки, комментарии и дубликаты.
+    Строки выбираются одним проходом регулярного выражения по отображённому в память
+    файлу (mmap), без Python-цикла по строкам.
+    """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            seen = set()
-            domains = []
-            for line in f:
-                domain = line.strip()
-                if domain and not domain.startswith('#') and domain not in seen:
-                    seen.add(domain)
-                    domains.append(domain)
-            return domains
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:  # пустой файл mmap не отображает
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                lines = [m.decode('utf-8').strip() for m in DOMAIN_LINE_RE.findall(data)]
+        found = [d for d in lines if d and not d.startswith('#')]
+        # dict.fromkeys убирает дубликаты, сохраняя порядок
+        unique = dict.fromkeys(found)
+        if len(unique) < len(found):
+            print(f"Пропущено дубликатов: {len(found) - len(unique)}")
+        return list(unique)
     except FileNotFoundError:
         print(f"Ошибка: файл '{file_path}' не найден.")
         sys.exit(1)
 
 
+def zone_order_key(domain: str) -> list[str]:
+    """
+    Ключ сортировки по зонам: метки домена справа налево ('api.example.com' → com, example, api).
+    Домены одной зоны идут подряд и опрашивают одни и те же NS почти одновременно,
+    поэтому ответы чаще берутся из кэша публичного резолвера.
+    """
+    return domain.lower().split('.')[::-1]
+
+
+def get_loop_factory() -> Callable[[], asyncio.AbstractEventLoop] | None:
+    """
+    Возвращает фабрику event loop на uvloop (libuv), если он установлен.
+    Необязательная зависимость: на Windows и без пакета — None (стандартный asyncio).
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return None
+    return uvloop.new_event_loop
+
+
+def run_async(coro: Awaitable[T]) -> T:
+    """Запускает корутину на uvloop, если он доступен, иначе через обычный asyncio.run."""
+    loop_factory = get_loop_factory()
+    if loop_factory is None:
+        return asyncio.run(coro)
+    if sys.version_info >= (3, 11):
+        # Фабрика действует только на этот запуск, глобальную политику не трогаем
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            return runner.run(coro)
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(coro)
+
+
+def available_cpus() -> list[int]:
+    """Номера ядер, на которых разрешено работать процессу (учитывает taskset/cgroups на Linux)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def check_shard(
+    shard: list[str],
+    concurrency: int,
+    use_ping: bool,
+    dead_path: str,
+    dns_concurrency: int = DNS_CONCURRENCY,
+    cpu: int | None = None
+) -> tuple[int, int]:
+    """
+    Проверяет часть списка в отдельном процессе со своим event loop (см. run_checks_in_processes).
+    Если задан cpu, процесс закрепляется за этим ядром (только Linux): планировщик
+    не переносит его между ядрами, и кэши ядра не делятся с соседними процессами.
+    """
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {cpu})
+        except OSError:
+            pass
+    raise_nofile_limit()
+    return run_async(run_checks(
+        shard, concurrency, dns_concurrency=dns_concurrency, use_ping=use_ping, dead_path=dead_path
+    ))
+
+
+def default_processes(total: int) -> int:
+    """Число процессов для списка из total доменов: по одному на SHARD_MIN_DOMAINS, не больше ядер."""
+    return max(1, min(len(available_cpus()), -(-total // SHARD_MIN_DOMAINS)))
+
+
+def run_checks_in_processes(
+    domains: list[str],
+    processes: int,
+    concurrency: int,
+    use_ping: bool = False
+) -> tuple[int, int]:
+    """
+    Делит список на `processes` непрерывных частей (сортировка по зонам сохраняется)
+    и проверяет их параллельно в отдельных процессах: один event loop упирается в одно ядро.
+    Каждая часть пишет мёртвые домены в свой dead.txt.partN, в конце они склеиваются в DEAD_FILE.
+    Процессы закрепляются за доступными ядрами по кругу (см. check_shard).
+    DNS_CONCURRENCY делится между процессами: публичные DNS-серверы получают столько же
+    запросов одновременно, сколько и в одном процессе (перегрузка видна как таймауты, не SERVFAIL).
+    Возвращает (число живых, число мёртвых).
+    """
+    size = -(-len(domains) // processes)
+    shards = [domains[i:i + size] for i in range(0, len(domains), size)]
+    parts = [f"{DEAD_FILE}.part{i}" for i in range(len(shards))]
+    cpus = available_cpus()
+    dns_concurrency = max(1, DNS_CONCURRENCY // processes)
+    alive_count = 0
+    dead_count = 0
+    
+    try:
+        with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            futures = [
+                pool.submit(
+                    check_shard, shard, concurrency, use_ping, part, dns_concurrency, cpus[i % len(cpus)]
+                )
+                for i, (shard, part) in enumerate(zip(shards, parts))
+            ]
+            for done, future in enumerate(as_completed(futures), 1):
+                alive, dead = future.result()
+                alive_count += alive
+                dead_count += dead
+                print(f"Частей проверено: {done}/{len(shards)}", file=sys.stderr)
+        
+        with open(DEAD_FILE, 'w', encoding='utf-8') as dead_file:
+            for part in parts:
+                with open(part, 'r', encoding='utf-8') as f:
+                    shutil.copyfileobj(f, dead_file)
+    finally:
+        for part in parts:
+            if os.path.exists(part):
+                os.unlink(part)
+    
+    return alive_count, dead_count
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(description="Проверка доступности доменов из list.txt.")
+    parser.add_argument(
+        '--concurrency', type=int, default=None, metavar='N',
+        help="воркеров на HTTP/TCP/Ping (по умолчанию — из лимита открытых файлов, "
+             f"от {MIN_CONCURRENCY} до {MAX_CONCURRENCY})"
+    )
+    parser.add_argument(
+        '--processes', type=int, default=None, metavar='N',
+        help="процессов для проверки (по умолчанию — по одному на "
+             f"{SHARD_MIN_DOMAINS} доменов, не больше числа ядер)"
+    )
+    parser.add_argument(
+        '--use-ping', action='store_true',
+        help="дополнительно пинговать домены (ICMP / системный ping); по умолчанию хватает DNS и TCP"
+    )
+    args = parser.parse_args(argv)
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--concurrency должно быть больше нуля")
+    if args.processes is not None and args.processes < 1:
+        parser.error("--processes должно быть больше нуля")
+    return args
+
+
 def main():
+    args = parse_args()
+    raise_nofile_limit()
+    concurrency = args.concurrency or default_concurrency()
     file_path = 'list.txt'
     domains = load_domains(file_path)
     
@@ -269,83 +1167,135 @@ def main():
         print("Список доменов пуст.")
         sys.exit(0)
     
+    domains.sort(key=zone_order_key)
+    processes = min(args.processes or default_processes(len(domains)), len(domains))
     print(f"Начало проверки {len(domains)} доменов...")
-    print("Метод: DNS → HTTP → TCP → Ping\n")
+    print("Метод: DNS → HTTP → TCP" + (" → Ping" if args.use_ping else ""))
+    if processes > 1:
+        print(f"Воркеров: {max(1, DNS_CONCURRENCY // processes)} на DNS, {concurrency} на HTTP/TCP/Ping"
+              f" в каждом из {processes} процессов")
+    else:
+        print(f"Воркеров: {DNS_CONCURRENCY} на DNS, {concurrency} на HTTP/TCP/Ping")
+    print(f"Event loop: {'uvloop' if get_loop_factory() else 'asyncio'}\n")
     
-    alive, dead = asyncio.run(
-        run_checks(domains, use_http=True, progress_callback=print_progress)
-    )
+    if processes > 1:
+        alive_count, dead_count = run_checks_in_processes(domains, processes, concurrency, args.use_ping)
+    else:
+        alive_count, dead_count = run_async(
+            run_checks(
+                domains, concurrency, use_http=True,
+                progress_callback=make_tqdm_progress() or print_progress, use_ping=args.use_ping
+            )
+        )
     
-    print()  # Новая строка после прогресса
     print(f"\n{'='*50}")
     print(f"Проверено: {len(domains)}")
-    print(f"Рабочих:   {len(alive)}")
-    print(f"Мёртвых:   {len(dead)}")
+    print(f"Рабочих:   {alive_count}")
+    print(f"Мёртвых:   {dead_count}")
     
-    if dead:
+    if dead_count:
         print(f"\n{'='*50}")
-        print("Мёртвые домены:")
-        for domain, details in dead:
-            status = []
-            if not details['dns']:
-                status.append("DNS✗")
-            else:
-                status.append("DNS✓")
-                if not details['http']:
-                    status.append("HTTP✗")
-                if not details.get('tcp', False):
-                    status.append("TCP✗")
-                if not details['ping']:
-                    status.append("Ping✗")
-            print(f"  - {domain} [{' '.join(status)}]")
+        print(f"Мёртвые домены ({DEAD_FILE}):")
+        sys.stdout.flush()
+        with open(DEAD_FILE, 'r', encoding='utf-8') as f:
+            shutil.copyfileobj(f, sys.stdout)
         
         # Предложение удалить мёртвые домены
         print(f"\n{'='*50}")
-        answer = input("Удалить мёртвые домены из list.txt? (Y/N): ").strip().lower()
+        answer = input(
+            "Удалить мёртвые домены из list.txt? (Y — все / N — нет / E — выбрать в редакторе): "
+        ).strip().lower()
         if answer == 'y':
-            remove_dead_domains(file_path, dead)
+            remove_dead_domains(file_path, read_marked_domains(DEAD_FILE))
+        elif answer == 'e':
+            remove_dead_domains(file_path, choose_in_editor(DEAD_FILE))
+
+
+def format_status(details: dict) -> str:
+    """Формирует краткий статус проверок домена, например 'DNS✓ HTTP✗ TCP✗ Ping✗'."""
+    if not details['dns']:
+        return "DNS✗"
+    status = ["DNS✓"]
+    if not details['http']:
+        status.append("HTTP✗")
+    if not details.get('tcp', False):
+        status.append("TCP✗")
+    if not details.get('ping', True):  # без --use-ping ping не проверялся
+        status.append("Ping✗")
+    return ' '.join(status)
 
 
-def remove_dead_domains(file_path: str, dead: list[tuple[str, dict]]) -> None:
+def read_marked_domains(path: str) -> set[str]:
+    """Читает домены из файла формата 'домен  # комментарий', пропуская пустые строки и комментарии."""
+    with open(path, 'r', encoding='utf-8') as f:
+        domains = {line.split('#', 1)[0].strip() for line in f}
+    domains.discard('')
+    return domains
+
+
+def choose_in_editor(dead_path: str) -> set[str]:
     """
-    Интерактивно удаляет мёртвые домены из файла.
-    Сохраняет структуру файла (комментарии, пустые строки).
+    Открывает копию списка мёртвых доменов (dead_path) в редакторе ($VISUAL / $EDITOR) один раз.
+    Домены, оставшиеся в файле после сохранения, будут удалены из list.txt.
+    Если редактор не запустился или завершился с ошибкой (например, vim :cq), ничего не удаляется.
     """
-    dead_domains = {d[0] for d in dead}
+    is_windows = platform.system().lower() == 'windows'
+    editor = os.environ.get('VISUAL') or os.environ.get('EDITOR') or ('notepad' if is_windows else 'vi')
+    command = shlex.split(editor, posix=not is_windows)
+    if is_windows:
+        # posix=False оставляет кавычки: "C:\Program Files\...\editor.exe"
+        command = [arg[1:-1] if len(arg) > 1 and arg[0] == arg[-1] == '"' else arg for arg in command]
     
-    # Читаем файл как есть (сохраняем структуру)
-    with open(file_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+    with tempfile.NamedTemporaryFile(
+        'w', encoding='utf-8', suffix='.txt', prefix='dead_domains_', delete=False
+    ) as f:
+        f.write("# REMOVE? Домены из этого файла будут удалены из list.txt.\n")
+        f.write("# Удалите строки доменов, которые нужно оставить, сохраните и закройте редактор.\n")
+        with open(dead_path, 'r', encoding='utf-8') as dead_file:
+            shutil.copyfileobj(dead_file, f)
+        path = f.name
     
-    removed = 0
-    new_lines = []
+    try:
+        try:
+            returncode = subprocess.run([*command, path], check=False).returncode
+        except OSError as e:
+            print(f"Не удалось запустить редактор '{editor}': {e}. Ничего не удалено.")
+            return set()
+        if returncode != 0:
+            print(f"Редактор завершился с кодом {returncode}. Ничего не удалено.")
+            return set()
+        chosen = read_marked_domains(path)
+    finally:
+        os.unlink(path)
     
-    for line in lines:
-        stripped = line.strip()
-        
-        # Если строка — мёртвый домен, спрашиваем
-        if stripped in dead_domains:
-            # Формируем статус для отображения
-            for domain, details in dead:
-                if domain == stripped:
-                    status = []
-                    if not details['dns']:
-                        status.append("DNS✗")
-                    else:
-                        status.append("DNS✓ HTTP✗ TCP✗ Ping✗")
-                    status_str = ' '.join(status)
-                    break
-            
-            answer = input(f"Удалить '{stripped}' [{status_str}]? (Y/N): ").strip().lower()
-            if answer == 'y':
-                removed += 1
-                continue  # Пропускаем строку (не добавляем в new_lines)
-        
-        new_lines.append(line)
+    return chosen & read_marked_domains(dead_path)
+
+
+def remove_dead_domains(file_path: str, to_remove: set[str]) -> None:
+    """
+    Удаляет выбранные домены из файла за один проход записи.
+    Сохраняет структуру файла (комментарии, пустые строки).
+    """
+    # Читаем построчно и сразу пишем во временный файл рядом с исходным,
+    # не держа весь список в памяти; затем атомарно подменяем исходный файл
+    removed = 0
+    directory = os.path.dirname(os.path.abspath(file_path))
+    with open(file_path, 'r', encoding='utf-8') as src, \
+            tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory,
+                                        suffix='.tmp', delete=False) as dst:
+        try:
+            for line in src:
+                if line.strip() in to_remove:
+                    removed += 1
+                else:
+                    dst.write(line)
+        except BaseException:
+            dst.close()
+            os.unlink(dst.name)
+            raise
     
-    # Записываем обратно
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.writelines(new_lines)
+    os.chmod(dst.name, os.stat(file_path).st_mode & 0o7777)
+    os.replace(dst.name, file_path)
     
     print(f"\nУдалено: {removed} доменов")
 